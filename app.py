@@ -3,19 +3,22 @@ Visitor Management System
 A secure, automated digital system to replace traditional manual visitor registers.
 
 Future Enhancements (mentioned for viva):
-- QR code passes for visitors
 - SMS notifications for check-in/check-out
 - Biometric verification
 - Email notifications
 - Visitor photo capture
-- Appointment module with email/SMS notifications
 """
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, abort, Response
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+import os
+import re
 import mysql.connector
 from mysql.connector import Error
+from analytics import fetch_visitor_columns, compute_visitor_analytics
+from notifier import NotificationDispatcher, enqueue_notification
+from passes import issue_pass, verify_pass, render_pass_qr
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-in-production'  # Change this in production
@@ -28,6 +31,33 @@ DB_CONFIG = {
     'database': 'visitor_management'
 }
 
+# Outgoing mail configuration for appointment notifications
+# For local testing run an SMTP sink: python -m aiosmtpd -n -l localhost:1025
+SMTP_CONFIG = {
+    'host': 'localhost',
+    'port': 1025,
+    'username': '',  # Leave empty if the server does not require login
+    'password': '',
+    'use_tls': False,
+    'sender': 'noreply@visitor-management.local'
+}
+
+# Email-to-SMS gateway domain, e.g. 'sms.example.com' sends SMS to <contact>@sms.example.com
+# Leave empty to disable SMS notifications
+SMS_GATEWAY_DOMAIN = ''
+
+# Accepted notification email addresses (no whitespace, so no CR/LF header injection)
+EMAIL_PATTERN = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+
+# How long before an approved appointment the reminder is sent
+REMINDER_LEAD_TIME = timedelta(hours=24)
+
+# Key used to sign visitor QR passes
+PASS_SECRET = b'your-pass-signing-key-change-in-production'  # Change this in production
+
+# How long a visitor pass stays valid after it is issued
+PASS_VALIDITY = timedelta(hours=24)
+
 
 def get_db_connection():
     """
@@ -64,6 +94,7 @@ def init_database():
                         appointment_date DATE NOT NULL,
                         appointment_time TIME NOT NULL,
                         status ENUM('PENDING', 'APPROVED', 'REJECTED') DEFAULT 'PENDING',
+                        email VARCHAR(100) NULL,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                 """)
@@ -72,6 +103,51 @@ def init_database():
             except Error as e:
                 print(f"Note: Appointments table may already exist: {e}")
             
+            # Add email column to appointments table if it doesn't exist
+            try:
+                cursor.execute("""
+                    SELECT COLUMN_NAME 
+                    FROM INFORMATION_SCHEMA.COLUMNS 
+                    WHERE TABLE_SCHEMA = DATABASE() 
+                    AND TABLE_NAME = 'appointments' 
+                    AND COLUMN_NAME = 'email'
+                """)
+                if not cursor.fetchone():
+                    cursor.execute("ALTER TABLE appointments ADD COLUMN email VARCHAR(100) NULL")
+                    conn.commit()
+                    print("Added email column to appointments table")
+            except Error as e:
+                print(f"Note: email column may already exist: {e}")
+            
+            # Create notification outbox table if it doesn't exist
+            try:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS notification_outbox (
+                        notification_id INT AUTO_INCREMENT PRIMARY KEY,
+                        appointment_id INT NULL,
+                        kind ENUM('APPROVED', 'REJECTED', 'REMINDER') NOT NULL,
+                        channel ENUM('EMAIL', 'SMS') NOT NULL,
+                        recipient VARCHAR(150) NOT NULL,
+                        subject VARCHAR(200) NOT NULL,
+                        body TEXT NOT NULL,
+                        status ENUM('PENDING', 'SENDING', 'SENT', 'FAILED', 'CANCELLED') DEFAULT 'PENDING',
+                        attempts INT NOT NULL DEFAULT 0,
+                        next_attempt_at DATETIME NOT NULL,
+                        claim_token CHAR(32) NULL,
+                        claimed_at DATETIME NULL,
+                        sent_at DATETIME NULL,
+                        last_error VARCHAR(255) NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        INDEX idx_outbox_due (status, next_attempt_at),
+                        INDEX idx_outbox_claim (claim_token),
+                        FOREIGN KEY (appointment_id) REFERENCES appointments(appointment_id) ON DELETE SET NULL
+                    )
+                """)
+                conn.commit()
+                print("Notification outbox table checked/created successfully")
+            except Error as e:
+                print(f"Note: Notification outbox table may already exist: {e}")
+            
             # Add appointment_id column to visitors table if it doesn't exist
             try:
                 cursor.execute("""
@@ -205,7 +281,7 @@ def register():
     """
     Visitor registration page.
     Captures: name, contact, ID proof, purpose, person to meet.
-    Generates unique visitor ID.
+    Generates unique visitor ID and issues a signed QR pass.
     """
     if request.method == 'POST':
         name = request.form.get('name')
@@ -241,13 +317,89 @@ def register():
                 conn.close()
                 
                 flash(f'Visitor registered successfully! Visitor ID: {visitor_id}', 'success')
-                return redirect(url_for('register'))
+                return redirect(url_for('visitor_pass', token=issue_pass(PASS_SECRET, visitor_id, PASS_VALIDITY)))
             except Error as e:
                 flash(f'Error registering visitor: {str(e)}', 'error')
         
     return render_template('register.html')
 
 
+# ==================== VISITOR PASSES ====================
+
+@app.route('/pass/<token>')
+def visitor_pass(token):
+    """
+    Visitor pass page.
+    Shows the QR code to be scanned at the gate.
+    The token is verified locally - no database access.
+    """
+    try:
+        visitor_id, expires = verify_pass(PASS_SECRET, token)
+    except ValueError:
+        abort(404)
+    return render_template('visitor_pass.html',
+                         token=token,
+                         visitor_id=visitor_id,
+                         expires=datetime.fromtimestamp(expires))
+
+
+@app.route('/pass/<token>/qr.svg')
+def visitor_pass_qr(token):
+    """QR image for a visitor pass (rendered once, then served from cache)"""
+    try:
+        verify_pass(PASS_SECRET, token)
+    except ValueError:
+        abort(404)
+    response = Response(render_pass_qr(token), mimetype='image/svg+xml')
+    response.headers['Cache-Control'] = 'private, max-age=86400'
+    return response
+
+
+@app.route('/issue-pass/<int:visitor_id>')
+@login_required
+def reissue_pass(visitor_id):
+    """
+    Admin route to issue a fresh pass for an existing visitor.
+    Covers visitors registered before passes existed, lost pass links
+    and visitors returning after PASS_VALIDITY. Linked from dashboard and report rows.
+    """
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT visitor_id FROM visitors WHERE visitor_id = %s",
+            (visitor_id,)
+        )
+        visitor = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        
+        if visitor:
+            return redirect(url_for('visitor_pass', token=issue_pass(PASS_SECRET, visitor_id, PASS_VALIDITY)))
+        flash('Visitor ID not found', 'error')
+    
+    return redirect(url_for('dashboard'))
+
+
+def scan_rejection_message(cursor, visitor_id, action):
+    """
+    Explain why a check-in/check-out UPDATE changed no rows.
+    Only runs on the rare zero-row path, so valid scans stay a single UPDATE.
+    """
+    cursor.execute(
+        "SELECT status FROM visitors WHERE visitor_id = %s",
+        (visitor_id,)
+    )
+    visitor = cursor.fetchone()
+    if not visitor:
+        return 'Visitor ID not found', 'error'
+    if action == 'checkin':
+        return 'Visitor is already checked in', 'warning'
+    if visitor[0] == 'EXITED':
+        return 'Visitor has already checked out', 'warning'
+    return 'Visitor needs to check in first', 'error'
+
+
 # ==================== CHECK-IN SYSTEM ====================
 
 @app.route('/checkin', methods=['GET', 'POST'])
@@ -255,40 +407,39 @@ def register():
 def checkin():
     """
     Visitor check-in page.
-    Records check-in time and sets status to INSIDE.
+    Verifies the scanned pass locally, then records check-in time
+    and sets status to INSIDE with a single UPDATE.
     """
     if request.method == 'POST':
-        visitor_id = request.form.get('visitor_id')
+        pass_code = request.form.get('pass_code')
         
-        if not visitor_id:
-            flash('Please enter visitor ID', 'error')
+        if not pass_code:
+            flash('Please scan or enter the visitor pass', 'error')
+            return render_template('checkin.html')
+        
+        # Reject forged or expired passes without touching the database
+        try:
+            visitor_id, _ = verify_pass(PASS_SECRET, pass_code)
+        except ValueError as e:
+            flash(str(e), 'error')
             return render_template('checkin.html')
         
         conn = get_db_connection()
         if conn:
-            cursor = conn.cursor(dictionary=True)
-            # Check if visitor exists
+            cursor = conn.cursor()
+            # Update check-in unless already checked in
             cursor.execute(
-                "SELECT * FROM visitors WHERE visitor_id = %s",
-                (visitor_id,)
+                """UPDATE visitors SET check_in_time = %s, status = 'INSIDE' 
+                   WHERE visitor_id = %s 
+                   AND NOT (status = 'INSIDE' AND check_in_time IS NOT NULL)""",
+                (datetime.now(), visitor_id)
             )
-            visitor = cursor.fetchone()
+            conn.commit()
             
-            if visitor:
-                # Check if already checked in
-                if visitor['status'] == 'INSIDE' and visitor['check_in_time']:
-                    flash('Visitor is already checked in', 'warning')
-                else:
-                    # Update check-in
-                    cursor.execute(
-                        """UPDATE visitors SET check_in_time = %s, status = 'INSIDE' 
-                           WHERE visitor_id = %s""",
-                        (datetime.now(), visitor_id)
-                    )
-                    conn.commit()
-                    flash(f'Visitor {visitor["name"]} checked in successfully!', 'success')
+            if cursor.rowcount:
+                flash(f'Visitor #{visitor_id} checked in successfully!', 'success')
             else:
-                flash('Visitor ID not found', 'error')
+                flash(*scan_rejection_message(cursor, visitor_id, 'checkin'))
             
             cursor.close()
             conn.close()
@@ -303,42 +454,38 @@ def checkin():
 def checkout():
     """
     Visitor check-out page.
-    Records check-out time and sets status to EXITED.
+    Verifies the scanned pass locally, then records check-out time
+    and sets status to EXITED with a single UPDATE.
     """
     if request.method == 'POST':
-        visitor_id = request.form.get('visitor_id')
+        pass_code = request.form.get('pass_code')
         
-        if not visitor_id:
-            flash('Please enter visitor ID', 'error')
+        if not pass_code:
+            flash('Please scan or enter the visitor pass', 'error')
+            return render_template('checkout.html')
+        
+        # Reject forged or expired passes without touching the database
+        try:
+            visitor_id, _ = verify_pass(PASS_SECRET, pass_code)
+        except ValueError as e:
+            flash(str(e), 'error')
             return render_template('checkout.html')
         
         conn = get_db_connection()
         if conn:
-            cursor = conn.cursor(dictionary=True)
-            # Check if visitor exists
+            cursor = conn.cursor()
+            # Update check-out only for visitors currently inside
             cursor.execute(
-                "SELECT * FROM visitors WHERE visitor_id = %s",
-                (visitor_id,)
+                """UPDATE visitors SET check_out_time = %s, status = 'EXITED' 
+                   WHERE visitor_id = %s AND status = 'INSIDE'""",
+                (datetime.now(), visitor_id)
             )
-            visitor = cursor.fetchone()
+            conn.commit()
             
-            if visitor:
-                # Check if already checked out
-                if visitor['status'] == 'EXITED':
-                    flash('Visitor has already checked out', 'warning')
-                elif visitor['status'] == 'INSIDE':
-                    # Update check-out
-                    cursor.execute(
-                        """UPDATE visitors SET check_out_time = %s, status = 'EXITED' 
-                           WHERE visitor_id = %s""",
-                        (datetime.now(), visitor_id)
-                    )
-                    conn.commit()
-                    flash(f'Visitor {visitor["name"]} checked out successfully!', 'success')
-                else:
-                    flash('Visitor needs to check in first', 'error')
+            if cursor.rowcount:
+                flash(f'Visitor #{visitor_id} checked out successfully!', 'success')
             else:
-                flash('Visitor ID not found', 'error')
+                flash(*scan_rejection_message(cursor, visitor_id, 'checkout'))
             
             cursor.close()
             conn.close()
@@ -447,6 +594,45 @@ def reports():
                          selected_month=selected_month)
 
 
+# ==================== ANALYTICS MODULE ====================
+
+@app.route('/analytics')
+@login_required
+def analytics():
+    """
+    Visitor analytics page.
+    Shows peak hours, dwell-time distribution, busiest hosts and
+    purpose breakdown for any date range.
+    """
+    today = date.today()
+    start = request.args.get('start', today.replace(day=1).strftime('%Y-%m-%d'))
+    end = request.args.get('end', today.strftime('%Y-%m-%d'))
+
+    stats = None
+    try:
+        start_date = datetime.strptime(start, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end, '%Y-%m-%d').date()
+    except ValueError:
+        flash('Invalid date format', 'error')
+        return render_template('analytics.html', stats=stats, start=start, end=end)
+
+    if start_date > end_date:
+        flash('Start date must be on or before end date', 'error')
+        return render_template('analytics.html', stats=stats, start=start, end=end)
+
+    conn = get_db_connection()
+    if conn:
+        try:
+            columns = fetch_visitor_columns(conn, start_date, end_date)
+            stats = compute_visitor_analytics(columns)
+        except Error as e:
+            flash(f'Error generating analytics: {str(e)}', 'error')
+        finally:
+            conn.close()
+
+    return render_template('analytics.html', stats=stats, start=start, end=end)
+
+
 # ==================== APPOINTMENT MODULE ====================
 
 @app.route('/book-appointment', methods=['GET', 'POST'])
@@ -463,6 +649,7 @@ def book_appointment():
         person_to_meet = request.form.get('person_to_meet')
         appointment_date = request.form.get('appointment_date')
         appointment_time = request.form.get('appointment_time')
+        email = request.form.get('email', '').strip() or None
         
         # Pass today's date for template
         today = date.today().strftime('%Y-%m-%d')
@@ -477,6 +664,11 @@ def book_appointment():
             flash('Please enter a valid contact number', 'error')
             return render_template('book_appointment.html', today=today)
         
+        # Validate email (optional, used for notifications)
+        if email and (not EMAIL_PATTERN.fullmatch(email) or len(email) > 100):
+            flash('Please enter a valid email address', 'error')
+            return render_template('book_appointment.html', today=today)
+        
         # Validate appointment date (should be in the future)
         try:
             appt_date = datetime.strptime(appointment_date, '%Y-%m-%d').date()
@@ -494,9 +686,9 @@ def book_appointment():
                 # Insert appointment request with PENDING status
                 cursor.execute(
                     """INSERT INTO appointments (visitor_name, contact, purpose, person_to_meet, 
-                       appointment_date, appointment_time, status) 
-                       VALUES (%s, %s, %s, %s, %s, %s, 'PENDING')""",
-                    (visitor_name, contact, purpose, person_to_meet, appointment_date, appointment_time)
+                       appointment_date, appointment_time, status, email) 
+                       VALUES (%s, %s, %s, %s, %s, %s, 'PENDING', %s)""",
+                    (visitor_name, contact, purpose, person_to_meet, appointment_date, appointment_time, email)
                 )
                 conn.commit()
                 appointment_id = cursor.lastrowid
@@ -553,21 +745,97 @@ def appointments():
                          today=today_date)
 
 
+def notification_recipients(appointment):
+    """
+    List (channel, recipient) pairs for an appointment.
+    Email if the visitor gave one, SMS if a gateway is configured.
+    """
+    recipients = []
+    if appointment['email']:
+        recipients.append(('EMAIL', appointment['email']))
+    if SMS_GATEWAY_DOMAIN:
+        recipients.append(('SMS', f"{appointment['contact']}@{SMS_GATEWAY_DOMAIN}"))
+    return recipients
+
+
+def appointment_start(appointment):
+    """
+    Combine an appointment's date and time into a datetime.
+    mysql-connector returns TIME columns as timedelta, not datetime.time.
+    """
+    return datetime.combine(appointment['appointment_date'], datetime.min.time()) + \
+        appointment['appointment_time']
+
+
+def queue_appointment_notifications(cursor, appointment_id, status):
+    """
+    Write appointment notifications to the outbox using the caller's cursor.
+    Nothing is sent here - the background dispatcher delivers them, so the
+    admin request never waits on the mail/SMS provider.
+    """
+    cursor.execute(
+        "SELECT * FROM appointments WHERE appointment_id = %s",
+        (appointment_id,)
+    )
+    appointment = cursor.fetchone()
+    if not appointment:
+        return
+
+    when = f"{appointment['appointment_date']} at {appointment['appointment_time']}"
+    greeting = f"Dear {appointment['visitor_name']},"
+
+    if status == 'APPROVED':
+        messages = [('APPROVED', 'Your appointment has been approved',
+                     f"{greeting}\n\nYour appointment with {appointment['person_to_meet']} "
+                     f"on {when} has been approved. Please bring a valid ID proof.",
+                     None)]
+        # Schedule a reminder ahead of the visit, if there is still time
+        remind_at = appointment_start(appointment) - REMINDER_LEAD_TIME
+        if remind_at > datetime.now():
+            messages.append(('REMINDER', 'Appointment reminder',
+                             f"{greeting}\n\nThis is a reminder of your appointment with "
+                             f"{appointment['person_to_meet']} on {when}.",
+                             remind_at))
+    else:
+        messages = [('REJECTED', 'Your appointment request was not approved',
+                     f"{greeting}\n\nWe are sorry, your appointment request with "
+                     f"{appointment['person_to_meet']} on {when} could not be approved.",
+                     None)]
+        # A previously approved appointment must not be reminded any more.
+        # In-flight (SENDING) reminders are cancelled too; the dispatcher only
+        # records results for rows still SENDING, so they are never retried.
+        cursor.execute(
+            """UPDATE notification_outbox SET status = 'CANCELLED', claim_token = NULL 
+               WHERE appointment_id = %s AND kind = 'REMINDER' 
+               AND status IN ('PENDING', 'SENDING')""",
+            (appointment_id,)
+        )
+
+    for channel, recipient in notification_recipients(appointment):
+        for kind, subject, body, send_after in messages:
+            enqueue_notification(cursor, appointment_id, kind, channel, recipient,
+                                 subject, body, send_after)
+
+
 @app.route('/approve-appointment/<int:appointment_id>')
 @login_required
 def approve_appointment(appointment_id):
     """
     Admin route to approve an appointment request.
-    Updates appointment status to APPROVED.
+    Updates appointment status to APPROVED and queues the approval
+    and reminder notifications in the same transaction.
     """
     conn = get_db_connection()
     if conn:
         try:
-            cursor = conn.cursor()
+            cursor = conn.cursor(dictionary=True)
             cursor.execute(
                 "UPDATE appointments SET status = 'APPROVED' WHERE appointment_id = %s",
                 (appointment_id,)
             )
+            # Only notify when the status actually changed
+            if cursor.rowcount:
+                queue_appointment_notifications(cursor, appointment_id, 'APPROVED')
             conn.commit()
             cursor.close()
             conn.close()
@@ -583,16 +851,20 @@ def approve_appointment(appointment_id):
 def reject_appointment(appointment_id):
     """
     Admin route to reject an appointment request.
-    Updates appointment status to REJECTED.
+    Updates appointment status to REJECTED and queues the rejection
+    notification in the same transaction.
     """
     conn = get_db_connection()
     if conn:
         try:
-            cursor = conn.cursor()
+            cursor = conn.cursor(dictionary=True)
             cursor.execute(
                 "UPDATE appointments SET status = 'REJECTED' WHERE appointment_id = %s",
                 (appointment_id,)
             )
+            # Only notify when the status actually changed
+            if cursor.rowcount:
+                queue_appointment_notifications(cursor, appointment_id, 'REJECTED')
             conn.commit()
             cursor.close()
             conn.close()
@@ -610,6 +882,7 @@ def convert_appointment(appointment_id):
     Convert an approved appointment into a visitor entry.
     Only approved appointments can be converted.
     Creates a visitor record with status INSIDE and links appointment_id.
+    Issues a signed QR pass for the new visitor.
     """
     conn = get_db_connection()
     if conn:
@@ -656,7 +929,7 @@ def convert_appointment(appointment_id):
             id_proof = f"Appointment-{appointment_id}"  # Placeholder ID proof
             
             # Combine appointment date and time for check-in
-            check_in_datetime = datetime.combine(appointment['appointment_date'], appointment['appointment_time'])
+            check_in_datetime = appointment_start(appointment)
             
             cursor.execute(
                 """INSERT INTO visitors (name, contact, id_proof, purpose, person_to_meet, 
@@ -672,6 +945,7 @@ def convert_appointment(appointment_id):
             conn.close()
             
             flash(f'Appointment converted successfully! Visitor ID: {visitor_id}', 'success')
+            return redirect(url_for('visitor_pass', token=issue_pass(PASS_SECRET, visitor_id, PASS_VALIDITY)))
         except Error as e:
             flash(f'Error converting appointment: {str(e)}', 'error')
     
@@ -697,6 +971,10 @@ def internal_error(error):
 # ==================== MAIN ====================
 
 if __name__ == '__main__':
+    debug = True
+    # Start the notification dispatcher once (the debug reloader runs this block in two processes)
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        NotificationDispatcher(get_db_connection, SMTP_CONFIG).start()
     # Run the Flask application
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=debug, host='0.0.0.0', port=5000)
 
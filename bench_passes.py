@@ -0,0 +1,140 @@
+"""
+Visitor Pass Benchmark
+Measures gate-scan throughput for genuine, forged, expired and replayed passes.
+
+Two levels are measured:
+- Pass verification alone (passes.verify_pass)
+- The full /checkin handler through Flask's test client, with a stub
+  database connection that counts the queries each scan issues
+
+Forged, tampered and expired passes are rejected before any database access.
+A first scan costs one UPDATE. A replayed scan costs two queries: the UPDATE
+that changes no rows, plus the SELECT that explains why it was rejected.
+The stub has no network latency, so real scans add one MySQL round trip per query.
+
+Run with:  python bench_passes.py
+"""
+
+import timeit
+from datetime import timedelta
+from unittest import mock
+
+from passes import issue_pass, verify_pass, render_pass_qr
+
+
+SECRET = b'benchmark-secret'
+ROUNDS = 100000
+HANDLER_ROUNDS = 2000
+
+
+class StubCursor:
+    """Counts queries; rowcount decides whether the UPDATE 'changed' a row"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = connection.rowcount
+
+    def execute(self, sql, params=None):
+        self.connection.queries += 1
+
+    def fetchone(self):
+        return ('INSIDE',)
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+
+    def __init__(self, rowcount):
+        self.rowcount = rowcount
+        self.queries = 0
+
+    def cursor(self, **kwargs):
+        return StubCursor(self)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def scan(token):
+    """Verify one scanned pass, ignoring the outcome"""
+    try:
+        verify_pass(SECRET, token)
+    except ValueError:
+        pass
+
+
+def bench_verification():
+    """Throughput of local signature and expiry checks"""
+    valid = issue_pass(SECRET, 12345, timedelta(hours=24))
+    visitor_id, expires, signature = valid.split('.')
+
+    scans = {
+        'valid signature': valid,
+        'forged signature': f"{visitor_id}.{expires}.{'A' * len(signature)}",
+        'tampered visitor id': f"54321.{expires}.{signature}",
+        'expired': issue_pass(SECRET, 12345, timedelta(hours=-1)),
+        'malformed': 'not-a-pass',
+    }
+
+    print(f"Pass verification only ({ROUNDS} scans each)")
+    for label, token in scans.items():
+        seconds = timeit.timeit(lambda: scan(token), number=ROUNDS)
+        print(f"  {label:<22} {ROUNDS / seconds:>12,.0f} scans/sec")
+
+
+def bench_handler():
+    """Throughput and query count of the full /checkin handler"""
+    with mock.patch('builtins.print'):
+        import app as vms
+
+    client = vms.app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+        session['username'] = 'admin'
+
+    valid = issue_pass(vms.PASS_SECRET, 12345, vms.PASS_VALIDITY)
+    visitor_id, expires, signature = valid.split('.')
+
+    # (label, pass code, rows changed by the UPDATE)
+    scans = [
+        ('first scan', valid, 1),
+        ('replayed scan', valid, 0),
+        ('forged signature', f"{visitor_id}.{expires}.{'A' * len(signature)}", 0),
+        ('expired', issue_pass(vms.PASS_SECRET, 12345, timedelta(hours=-1)), 0),
+    ]
+
+    print(f"Full /checkin handler, stub database ({HANDLER_ROUNDS} scans each)")
+    for label, token, rowcount in scans:
+        connection = StubConnection(rowcount)
+        with mock.patch.object(vms, 'get_db_connection', return_value=connection):
+            seconds = timeit.timeit(
+                lambda: client.post('/checkin', data={'pass_code': token}),
+                number=HANDLER_ROUNDS)
+        print(f"  {label:<22} {HANDLER_ROUNDS / seconds:>12,.0f} scans/sec"
+              f"   {connection.queries / HANDLER_ROUNDS:.0f} queries/scan")
+
+
+def bench_qr():
+    """First render versus cached render of a pass QR code"""
+    token = issue_pass(SECRET, 12345, timedelta(hours=24))
+    render_pass_qr.cache_clear()
+    cold = timeit.timeit(lambda: render_pass_qr(token), number=1)
+    cached = timeit.timeit(lambda: render_pass_qr(token), number=1000) / 1000
+    print("QR rendering")
+    print(f"  {'first render':<22} {cold * 1000:>12.2f} ms")
+    print(f"  {'cached render':<22} {cached * 1000:>12.4f} ms")
+
+
+def main():
+    bench_verification()
+    bench_handler()
+    bench_qr()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+Appointment Notification Dispatcher
+Background worker that delivers queued appointment notifications.
+
+Admin actions never talk to the mail/SMS provider directly. They write rows
+into the notification_outbox table in the same transaction as the appointment
+status change, and this dispatcher sends them later:
+- Claims due rows in batches so several dispatchers never send the same row
+- Sends a whole batch over one SMTP connection
+- Retries failed sends with exponential backoff
+- Records delivery state (SENT / FAILED) and the last error
+
+SMS messages are delivered through an email-to-SMS gateway, so both channels
+share the same SMTP connection.
+
+Run standalone with:  python notifier.py
+For local testing, point SMTP_CONFIG at a sink such as:
+    python -m aiosmtpd -n -l localhost:1025
+"""
+
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from mysql.connector import Error
+
+
+# Dispatcher settings
+BATCH_SIZE = 50             # Rows claimed per round trip
+POLL_INTERVAL = 5           # Seconds to wait when the outbox is empty
+MAX_ATTEMPTS = 5            # Attempts before a notification is marked FAILED
+BACKOFF_BASE = 30           # Seconds; retry delay doubles after each attempt
+CLAIM_TIMEOUT = 10          # Minutes before a stuck SENDING claim is released
+
+
+def enqueue_notification(cursor, appointment_id, kind, channel, recipient,
+                         subject, body, send_after=None):
+    """
+    Queue a notification in the outbox.
+    Uses the caller's cursor so the row is committed (or rolled back)
+    together with the appointment status change.
+    """
+    cursor.execute(
+        """INSERT INTO notification_outbox (appointment_id, kind, channel, recipient,
+           subject, body, next_attempt_at)
+           VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+        (appointment_id, kind, channel, recipient, subject, body,
+         send_after or datetime.now())
+    )
+
+
+def retry_delay(attempts):
+    """Backoff delay after the given number of failed attempts"""
+    return timedelta(seconds=BACKOFF_BASE * (2 ** (attempts - 1)))
+
+
+class NotificationDispatcher:
+    """
+    Claims due outbox rows in batches and delivers them over SMTP.
+    get_connection is a zero-argument callable returning a MySQL connection.
+    """
+
+    def __init__(self, get_connection, smtp_config):
+        self.get_connection = get_connection
+        self.smtp_config = smtp_config
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # ---------- Claiming ----------
+
+    def claim_batch(self, conn):
+        """
+        Atomically mark a batch of due rows as SENDING under a unique claim
+        token, then read back exactly the rows this dispatcher owns.
+        """
+        cursor = conn.cursor(dictionary=True)
+
+        # Release claims left behind by a dispatcher that crashed mid-batch.
+        # The lost claim counts as an attempt, so a row that keeps crashing
+        # the dispatcher eventually ends up FAILED instead of looping forever.
+        cursor.execute(
+            """UPDATE notification_outbox
+               SET attempts = attempts + 1, claim_token = NULL,
+                   status = IF(attempts >= %s, 'FAILED', 'PENDING'),
+                   last_error = 'Claim timed out'
+               WHERE status = 'SENDING' AND claimed_at < %s""",
+            (MAX_ATTEMPTS, datetime.now() - timedelta(minutes=CLAIM_TIMEOUT))
+        )
+
+        token = uuid.uuid4().hex
+        cursor.execute(
+            """UPDATE notification_outbox
+               SET status = 'SENDING', claim_token = %s, claimed_at = %s
+               WHERE status = 'PENDING' AND next_attempt_at <= %s
+               ORDER BY next_attempt_at, notification_id
+               LIMIT %s""",
+            (token, datetime.now(), datetime.now(), BATCH_SIZE)
+        )
+        conn.commit()
+
+        cursor.execute(
+            """SELECT * FROM notification_outbox
+               WHERE claim_token = %s AND status = 'SENDING'
+               ORDER BY notification_id""",
+            (token,)
+        )
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    # ---------- Delivery ----------
+
+    def open_smtp(self):
+        """Open one SMTP connection to be reused for a whole batch"""
+        config = self.smtp_config
+        smtp = smtplib.SMTP(config['host'], config['port'], timeout=config.get('timeout', 10))
+        if config.get('use_tls'):
+            smtp.starttls()
+        if config.get('username'):
+            smtp.login(config['username'], config['password'])
+        return smtp
+
+    def build_message(self, row):
+        """Build the email for an outbox row"""
+        message = EmailMessage()
+        message['From'] = self.smtp_config['sender']
+        message['To'] = row['recipient']
+        message['Subject'] = row['subject']
+        message.set_content(row['body'])
+        return message
+
+    def send_batch(self, rows):
+        """
+        Send claimed rows over a single SMTP connection.
+        Returns a list of (row, error) - error is None on success.
+        """
+        results = []
+        smtp = None
+        for index, row in enumerate(rows):
+            try:
+                message = self.build_message(row)
+            except Exception as e:
+                # Malformed row (e.g. bad header value); fail it without touching SMTP
+                results.append((row, f"Invalid message: {e}"))
+                continue
+            if smtp is None:
+                try:
+                    smtp = self.open_smtp()
+                except OSError as e:
+                    # Provider unreachable: the rest of the batch is retried later
+                    results.append((row, str(e)))
+                    results.extend((pending, str(e)) for pending in rows[index + 1:])
+                    return results
+            try:
+                smtp.send_message(message)
+                results.append((row, None))
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                # Rejected message; the connection itself is still usable
+                results.append((row, str(e)))
+            except OSError as e:
+                # Dropped connection is reopened for the next row
+                results.append((row, str(e)))
+                smtp = None
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except OSError:
+                pass
+        return results
+
+    def record_results(self, conn, results):
+        """
+        Store delivery state, scheduling retries with backoff.
+        Only rows still held under this batch's claim are updated, so a claim
+        that timed out and was re-claimed (or a cancelled reminder) is left alone.
+        """
+        cursor = conn.cursor()
+        now = datetime.now()
+        for row, error in results:
+            attempts = row['attempts'] + 1
+            if error is None:
+                cursor.execute(
+                    """UPDATE notification_outbox
+                       SET status = 'SENT', attempts = %s, sent_at = %s,
+                           last_error = NULL, claim_token = NULL
+                       WHERE notification_id = %s AND claim_token = %s AND status = 'SENDING'""",
+                    (attempts, now, row['notification_id'], row['claim_token'])
+                )
+            elif attempts >= MAX_ATTEMPTS:
+                cursor.execute(
+                    """UPDATE notification_outbox
+                       SET status = 'FAILED', attempts = %s, last_error = %s, claim_token = NULL
+                       WHERE notification_id = %s AND claim_token = %s AND status = 'SENDING'""",
+                    (attempts, error[:255], row['notification_id'], row['claim_token'])
+                )
+            else:
+                cursor.execute(
+                    """UPDATE notification_outbox
+                       SET status = 'PENDING', attempts = %s, last_error = %s,
+                           next_attempt_at = %s, claim_token = NULL
+                       WHERE notification_id = %s AND claim_token = %s AND status = 'SENDING'""",
+                    (attempts, error[:255], now + retry_delay(attempts), row['notification_id'],
+                     row['claim_token'])
+                )
+        conn.commit()
+        cursor.close()
+
+    # ---------- Main loop ----------
+
+    def dispatch_once(self):
+        """
+        Claim and deliver one batch.
+        Returns the number of notifications processed.
+        """
+        conn = self.get_connection()
+        if not conn:
+            return 0
+        try:
+            rows = self.claim_batch(conn)
+            if rows:
+                results = self.send_batch(rows)
+                self.record_results(conn, results)
+            return len(rows)
+        except Error as e:
+            print(f"Notification dispatcher database error: {e}")
+            return 0
+        finally:
+            conn.close()
+
+    def run_forever(self):
+        """Keep dispatching until stop() is called"""
+        while not self.stop_event.is_set():
+            try:
+                processed = self.dispatch_once()
+            except Exception as e:
+                # Never let one bad batch kill the background thread
+                print(f"Notification dispatcher error: {e}")
+                processed = 0
+            # Drain full batches back-to-back, sleep only when the outbox is idle
+            if processed < BATCH_SIZE:
+                self.stop_event.wait(POLL_INTERVAL)
+
+    def start(self):
+        """Run the dispatcher in a background daemon thread"""
+        self.thread = threading.Thread(target=self.run_forever, name='notification-dispatcher',
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Ask the background thread to finish its current batch and exit"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+
+if __name__ == '__main__':
+    from app import get_db_connection, SMTP_CONFIG
+
+    print("Notification dispatcher running. Press Ctrl+C to stop.")
+    dispatcher = NotificationDispatcher(get_db_connection, SMTP_CONFIG)
+    try:
+        dispatcher.run_forever()
+    except KeyboardInterrupt:
+        print("Notification dispatcher stopped.")
@@ -0,0 +1,77 @@
+"""
+Visitor QR Passes
+Signed, expiring pass tokens that the gate can verify without the database.
+
+A pass token looks like:  <visitor_id>.<expires>.<signature>
+- expires is a Unix timestamp
+- signature is a truncated HMAC-SHA256 of "<visitor_id>.<expires>"
+
+Forged, tampered or expired passes are rejected by checking the signature
+and expiry locally, so only genuine scans ever reach MySQL.
+"""
+
+import base64
+import hashlib
+import hmac
+import time
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+from qrcode.image.svg import SvgPathImage
+
+
+SIGNATURE_LENGTH = 22       # Base64 characters kept from the HMAC (128 bits)
+QR_CACHE_SIZE = 1024        # Rendered QR images kept in memory
+
+
+def sign(secret, payload):
+    """Compute the URL-safe signature for a pass payload"""
+    digest = hmac.new(secret, payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode()[:SIGNATURE_LENGTH]
+
+
+def issue_pass(secret, visitor_id, validity):
+    """
+    Issue a signed pass token for a visitor.
+    validity is a timedelta counted from now.
+    """
+    expires = int(time.time() + validity.total_seconds())
+    payload = f"{visitor_id}.{expires}"
+    return f"{payload}.{sign(secret, payload)}"
+
+
+def verify_pass(secret, token):
+    """
+    Verify a pass token and return (visitor_id, expires).
+    Raises ValueError if the pass is malformed, forged or expired.
+    No database access is needed.
+    """
+    # Non-ASCII input is rejected up front; isdigit() and compare_digest()
+    # would otherwise accept or choke on unicode digits and letters
+    parts = token.strip().split('.') if token and token.isascii() else []
+    if len(parts) != 3 or len(parts[2]) != SIGNATURE_LENGTH \
+            or not parts[0].isdigit() or not parts[1].isdigit():
+        raise ValueError('Invalid visitor pass')
+
+    visitor_id, expires, signature = parts
+    # Constant-time comparison so forged signatures leak nothing via timing
+    if not hmac.compare_digest(signature, sign(secret, f"{visitor_id}.{expires}")):
+        raise ValueError('Invalid visitor pass')
+
+    if int(expires) < time.time():
+        raise ValueError('Visitor pass has expired')
+
+    return int(visitor_id), int(expires)
+
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def render_pass_qr(token):
+    """
+    Render a pass token as an SVG QR code.
+    Cached, so repeated views of the same pass are not re-encoded.
+    """
+    image = qrcode.make(token, image_factory=SvgPathImage)
+    buffer = BytesIO()
+    image.save(buffer)
+    return buffer.getvalue()
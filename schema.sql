@@ -24,6 +24,7 @@ CREATE TABLE IF NOT EXISTS appointments (
     appointment_date DATE NOT NULL,
     appointment_time TIME NOT NULL,
     status ENUM('PENDING', 'APPROVED', 'REJECTED') DEFAULT 'PENDING',
+    email VARCHAR(100) NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -46,14 +47,36 @@ CREATE TABLE IF NOT EXISTS visitors (
     FOREIGN KEY (appointment_id) REFERENCES appointments(appointment_id) ON DELETE SET NULL
 );
 
+-- Notification outbox for appointment emails/SMS
+-- Rows are written in the same transaction as the appointment status change
+-- and delivered later by the background dispatcher (notifier.py)
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    notification_id INT AUTO_INCREMENT PRIMARY KEY,
+    appointment_id INT NULL,
+    kind ENUM('APPROVED', 'REJECTED', 'REMINDER') NOT NULL,
+    channel ENUM('EMAIL', 'SMS') NOT NULL,
+    recipient VARCHAR(150) NOT NULL,
+    subject VARCHAR(200) NOT NULL,
+    body TEXT NOT NULL,
+    status ENUM('PENDING', 'SENDING', 'SENT', 'FAILED', 'CANCELLED') DEFAULT 'PENDING',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at DATETIME NOT NULL,
+    claim_token CHAR(32) NULL,
+    claimed_at DATETIME NULL,
+    sent_at DATETIME NULL,
+    last_error VARCHAR(255) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_outbox_due (status, next_attempt_at),
+    INDEX idx_outbox_claim (claim_token),
+    FOREIGN KEY (appointment_id) REFERENCES appointments(appointment_id) ON DELETE SET NULL
+);
+
 -- Note: Default admin will be created automatically by Flask app on first run
 -- Default credentials: username='admin', password='admin123'
 -- The password will be hashed using Werkzeug's generate_password_hash()
 -- Run the Flask app once to initialize the default admin user
 
 -- Future Enhancements (mentioned for viva):
--- - Email notifications for appointment approval/rejection
--- - SMS reminders for upcoming appointments
 -- - Calendar integration
 -- - Recurring appointments
 -- - Appointment cancellation by visitors
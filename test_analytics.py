@@ -0,0 +1,99 @@
+"""
+Tests for visitor analytics statistics.
+Run with:  python -m pytest test_analytics.py
+"""
+
+import unittest
+
+import numpy as np
+
+from analytics import compute_visitor_analytics, rank_counts, DWELL_BUCKET_LABELS
+
+
+def make_columns(check_in, check_out, hours, hosts, purposes):
+    """Build analytics columns the way fetch_visitor_columns does"""
+    return {
+        'check_in': np.array(check_in, dtype=np.float64),
+        'check_out': np.array(check_out, dtype=np.float64),
+        'hours': np.array(hours, dtype=np.int64),
+        'hosts': np.array(hosts, dtype=str),
+        'purposes': np.array(purposes, dtype=str),
+    }
+
+
+class ComputeVisitorAnalyticsTest(unittest.TestCase):
+
+    def test_empty_range(self):
+        stats = compute_visitor_analytics(make_columns([], [], [], [], []))
+        self.assertEqual(stats['total'], 0)
+        self.assertEqual(stats['completed'], 0)
+        self.assertIsNone(stats['peak_hour'])
+        self.assertIsNone(stats['dwell_stats'])
+        self.assertEqual(stats['hour_counts'], [0] * 24)
+        self.assertEqual([count for _, count in stats['dwell_buckets']], [0] * len(DWELL_BUCKET_LABELS))
+        self.assertEqual(stats['top_hosts'], [])
+        self.assertEqual(stats['top_purposes'], [])
+
+    def test_nan_check_out_counts_as_still_inside(self):
+        stats = compute_visitor_analytics(make_columns(
+            [0, 0], [600, None], [9, 10], ['Alice', 'Bob'], ['Meeting', 'Meeting']))
+        self.assertEqual(stats['total'], 2)
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['still_inside'], 1)
+        self.assertEqual(stats['dwell_stats']['max'], 10.0)
+
+    def test_negative_dwell_is_ignored(self):
+        stats = compute_visitor_analytics(make_columns(
+            [600, 0], [0, 1200], [9, 9], ['Alice', 'Alice'], ['Meeting', 'Meeting']))
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['dwell_stats']['mean'], 20.0)
+        self.assertEqual(stats['dwell_stats']['median'], 20.0)
+
+    def test_peak_hour(self):
+        stats = compute_visitor_analytics(make_columns(
+            [0, 0, 0], [60, 60, 60], [9, 14, 14], ['A', 'B', 'C'], ['x', 'x', 'x']))
+        self.assertEqual(stats['peak_hour'], 14)
+        self.assertEqual(stats['hour_counts'][14], 2)
+        self.assertEqual(stats['hour_counts'][9], 1)
+
+    def test_bucket_edges(self):
+        # Buckets include their lower edge: 15 min is "15-30", 480 min is "8+"
+        minutes = [0, 14.9, 15, 30, 60, 120, 240, 480, 10000]
+        stats = compute_visitor_analytics(make_columns(
+            [0] * len(minutes), [m * 60 for m in minutes], [9] * len(minutes),
+            ['A'] * len(minutes), ['x'] * len(minutes)))
+        self.assertEqual(dict(stats['dwell_buckets']), {
+            '< 15 min': 2, '15-30 min': 1, '30-60 min': 1, '1-2 hrs': 1,
+            '2-4 hrs': 1, '4-8 hrs': 1, '8+ hrs': 2,
+        })
+
+
+class RankCountsTest(unittest.TestCase):
+
+    def test_busiest_first_with_ties_in_name_order(self):
+        ranked = rank_counts(np.array(['Carol', 'Bob', 'Alice', 'Bob', 'Carol', 'Dave']))
+        self.assertEqual([(e['name'], e['count']) for e in ranked],
+                         [('Bob', 2), ('Carol', 2), ('Alice', 1), ('Dave', 1)])
+
+    def test_limit(self):
+        ranked = rank_counts(np.array(['a', 'b', 'c', 'c']), limit=2)
+        self.assertEqual([e['name'] for e in ranked], ['c', 'a'])
+
+    def test_average_weights_skip_nan(self):
+        ranked = rank_counts(np.array(['Alice', 'Alice', 'Bob']),
+                             weights=np.array([10.0, np.nan, 30.0]))
+        self.assertEqual(ranked, [
+            {'name': 'Alice', 'count': 2, 'avg_dwell': 10.0},
+            {'name': 'Bob', 'count': 1, 'avg_dwell': 30.0},
+        ])
+
+    def test_no_completed_visits_has_no_average(self):
+        ranked = rank_counts(np.array(['Alice']), weights=np.array([np.nan]))
+        self.assertIsNone(ranked[0]['avg_dwell'])
+
+    def test_empty(self):
+        self.assertEqual(rank_counts(np.array([], dtype=str)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
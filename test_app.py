@@ -0,0 +1,120 @@
+"""
+Route tests for the Flask app, using a stub database connection.
+Run with:  python -m pytest test_app.py
+"""
+
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+with mock.patch('builtins.print'):
+    import app as vms
+from passes import issue_pass, verify_pass
+
+
+class StubCursor:
+    """Returns queued fetchone() results and records executed statements"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = connection.rowcount
+        self.lastrowid = connection.lastrowid
+
+    def execute(self, sql, params=None):
+        self.connection.executed.append(' '.join(sql.split()))
+
+    def fetchone(self):
+        return self.connection.results.pop(0)
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+
+    def __init__(self, results=(), rowcount=0, lastrowid=None):
+        self.results = list(results)
+        self.rowcount = rowcount
+        self.lastrowid = lastrowid
+        self.executed = []
+
+    def cursor(self, **kwargs):
+        return StubCursor(self)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class AppTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = vms.app.test_client()
+        with self.client.session_transaction() as session:
+            session['logged_in'] = True
+            session['username'] = 'admin'
+
+    def use_connection(self, connection):
+        patcher = mock.patch.object(vms, 'get_db_connection', return_value=connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return connection
+
+
+class ConvertAppointmentTest(AppTestCase):
+
+    def test_issues_pass_for_converted_visitor(self):
+        appointment = {
+            'appointment_id': 3,
+            'visitor_name': 'Asha',
+            'contact': '9876543210',
+            'purpose': 'Interview',
+            'person_to_meet': 'Dr. Rao',
+            'appointment_date': date.today() - timedelta(days=1),
+            # mysql-connector returns TIME columns as timedelta
+            'appointment_time': timedelta(hours=14, minutes=30),
+            'status': 'APPROVED',
+        }
+        connection = self.use_connection(StubConnection(results=[appointment, None], lastrowid=17))
+
+        response = self.client.get('/convert-appointment/3')
+
+        self.assertEqual(response.status_code, 302)
+        token = response.location.rsplit('/pass/', 1)[1]
+        self.assertEqual(verify_pass(vms.PASS_SECRET, token)[0], 17)
+        self.assertTrue(connection.executed[-1].startswith('INSERT INTO visitors'))
+
+    def test_appointment_start_combines_timedelta(self):
+        start = vms.appointment_start({'appointment_date': date(2026, 1, 5),
+                                       'appointment_time': timedelta(hours=9, minutes=15)})
+        self.assertEqual((start.year, start.month, start.day, start.hour, start.minute),
+                         (2026, 1, 5, 9, 15))
+
+
+class ScanTest(AppTestCase):
+
+    def test_forged_pass_never_touches_database(self):
+        with mock.patch.object(vms, 'get_db_connection') as get_connection:
+            response = self.client.post('/checkin', data={'pass_code': '1.9999999999.' + 'A' * 22})
+        self.assertIn(b'Invalid visitor pass', response.data)
+        get_connection.assert_not_called()
+
+    def test_valid_scan_is_one_update(self):
+        connection = self.use_connection(StubConnection(rowcount=1))
+        token = issue_pass(vms.PASS_SECRET, 5, vms.PASS_VALIDITY)
+        response = self.client.post('/checkout', data={'pass_code': token})
+        self.assertIn(b'checked out successfully', response.data)
+        self.assertEqual(len(connection.executed), 1)
+
+    def test_replayed_scan_explains_rejection(self):
+        connection = self.use_connection(StubConnection(results=[('EXITED',)]))
+        token = issue_pass(vms.PASS_SECRET, 5, vms.PASS_VALIDITY)
+        response = self.client.post('/checkout', data={'pass_code': token})
+        self.assertIn(b'already checked out', response.data)
+        self.assertEqual(len(connection.executed), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
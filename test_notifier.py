@@ -0,0 +1,204 @@
+"""
+Tests for the appointment notification dispatcher.
+Run with:  python -m pytest test_notifier.py
+"""
+
+import smtplib
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+import notifier
+from notifier import NotificationDispatcher, retry_delay, BACKOFF_BASE, MAX_ATTEMPTS
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+
+SMTP_CONFIG = {'host': '127.0.0.1', 'port': 10325, 'sender': 'noreply@example.com'}
+
+
+def make_row(notification_id, recipient='visitor@example.com', attempts=0):
+    """Build a claimed outbox row"""
+    return {
+        'notification_id': notification_id,
+        'recipient': recipient,
+        'subject': 'Your appointment has been approved',
+        'body': 'See you soon.',
+        'attempts': attempts,
+        'claim_token': 'a' * 32,
+    }
+
+
+class FakeCursor:
+    """Records executed statements"""
+
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((' '.join(sql.split()), params))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.cursor_obj = FakeCursor()
+        self.committed = False
+
+    def cursor(self, **kwargs):
+        return self.cursor_obj
+
+    def commit(self):
+        self.committed = True
+
+
+class SendBatchStubTest(unittest.TestCase):
+    """send_batch against a stubbed smtplib.SMTP"""
+
+    def setUp(self):
+        self.dispatcher = NotificationDispatcher(None, SMTP_CONFIG)
+        patcher = mock.patch('notifier.smtplib.SMTP')
+        self.smtp_class = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_connection_per_batch(self):
+        results = self.dispatcher.send_batch([make_row(i) for i in range(5)])
+        self.assertEqual([error for _, error in results], [None] * 5)
+        self.assertEqual(self.smtp_class.call_count, 1)
+        self.assertEqual(self.smtp_class.return_value.send_message.call_count, 5)
+        self.smtp_class.return_value.quit.assert_called_once()
+
+    def test_reopens_after_dropped_connection(self):
+        first, second = mock.Mock(), mock.Mock()
+        first.send_message.side_effect = smtplib.SMTPServerDisconnected('gone')
+        self.smtp_class.side_effect = [first, second]
+
+        results = self.dispatcher.send_batch([make_row(1), make_row(2)])
+
+        self.assertEqual(results[0][1], 'gone')
+        self.assertIsNone(results[1][1])
+        self.assertEqual(self.smtp_class.call_count, 2)
+        second.send_message.assert_called_once()
+
+    def test_rejected_recipient_fails_only_that_row(self):
+        smtp = self.smtp_class.return_value
+        smtp.send_message.side_effect = [
+            smtplib.SMTPRecipientsRefused({'bad@example.com': (550, b'No such user')}),
+            None,
+        ]
+
+        results = self.dispatcher.send_batch([make_row(1, 'bad@example.com'), make_row(2)])
+
+        self.assertIn('bad@example.com', results[0][1])
+        self.assertIsNone(results[1][1])
+        self.assertEqual(self.smtp_class.call_count, 1)
+
+    def test_unreachable_provider_fails_whole_batch(self):
+        self.smtp_class.side_effect = ConnectionRefusedError('refused')
+        results = self.dispatcher.send_batch([make_row(1), make_row(2)])
+        self.assertEqual([error for _, error in results], ['refused', 'refused'])
+        self.assertEqual(self.smtp_class.call_count, 1)
+
+    def test_malformed_row_does_not_stop_batch(self):
+        results = self.dispatcher.send_batch([make_row(1, 'a@example.com\nBcc: x@example.com'),
+                                              make_row(2)])
+        self.assertTrue(results[0][1].startswith('Invalid message'))
+        self.assertIsNone(results[1][1])
+
+
+@unittest.skipIf(Controller is None, 'aiosmtpd is not installed')
+class SendBatchSinkTest(unittest.TestCase):
+    """send_batch against a local aiosmtpd SMTP sink"""
+
+    def setUp(self):
+        self.sessions = set()
+        self.recipients = []
+        self.controller = Controller(self, hostname=SMTP_CONFIG['host'], port=SMTP_CONFIG['port'])
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('bad@'):
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.recipients.extend(envelope.rcpt_tos)
+        return '250 OK'
+
+    def test_batch_over_one_session(self):
+        rows = [make_row(1, 'one@example.com'), make_row(2, 'bad@example.com'),
+                make_row(3, 'three@example.com')]
+        results = NotificationDispatcher(None, SMTP_CONFIG).send_batch(rows)
+
+        self.assertIsNone(results[0][1])
+        self.assertIsNotNone(results[1][1])
+        self.assertIsNone(results[2][1])
+        self.assertEqual(self.recipients, ['one@example.com', 'three@example.com'])
+        self.assertEqual(len(self.sessions), 1)
+
+
+class RetryTest(unittest.TestCase):
+
+    def test_retry_delay_doubles(self):
+        self.assertEqual([retry_delay(n) for n in (1, 2, 3)],
+                         [timedelta(seconds=BACKOFF_BASE * f) for f in (1, 2, 4)])
+
+    def record(self, row, error):
+        conn = FakeConnection()
+        NotificationDispatcher(None, SMTP_CONFIG).record_results(conn, [(row, error)])
+        self.assertTrue(conn.committed)
+        self.assertEqual(len(conn.cursor_obj.executed), 1)
+        return conn.cursor_obj.executed[0]
+
+    def test_sent(self):
+        sql, params = self.record(make_row(7), None)
+        self.assertIn("status = 'SENT'", sql)
+        self.assertEqual(params[0], 1)
+
+    def test_failure_is_retried_with_backoff(self):
+        sql, params = self.record(make_row(7, attempts=1), 'timeout')
+        self.assertIn("status = 'PENDING'", sql)
+        attempts, error, next_attempt_at, notification_id, token = params
+        self.assertEqual((attempts, error, notification_id), (2, 'timeout', 7))
+        self.assertEqual(token, 'a' * 32)
+
+    def test_failed_at_max_attempts(self):
+        sql, params = self.record(make_row(7, attempts=MAX_ATTEMPTS - 1), 'timeout')
+        self.assertIn("status = 'FAILED'", sql)
+        self.assertEqual(params[0], MAX_ATTEMPTS)
+
+    def test_updates_only_rows_still_claimed(self):
+        for attempts, error in ((0, None), (0, 'x'), (MAX_ATTEMPTS - 1, 'x')):
+            sql, _ = self.record(make_row(7, attempts=attempts), error)
+            self.assertIn("claim_token = %s AND status = 'SENDING'", sql)
+
+
+class RunForeverTest(unittest.TestCase):
+
+    def test_survives_errors(self):
+        dispatcher = NotificationDispatcher(None, SMTP_CONFIG)
+        calls = []
+
+        def failing_connection():
+            calls.append(1)
+            if len(calls) == 3:
+                dispatcher.stop_event.set()
+            raise RuntimeError('boom')
+
+        dispatcher.get_connection = failing_connection
+        with mock.patch.object(notifier, 'POLL_INTERVAL', 0), mock.patch('builtins.print'):
+            dispatcher.run_forever()
+        self.assertEqual(len(calls), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
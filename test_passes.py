@@ -0,0 +1,76 @@
+"""
+Tests for signed visitor passes.
+Run with:  python -m pytest test_passes.py
+"""
+
+import unittest
+from datetime import timedelta
+
+from passes import issue_pass, verify_pass, render_pass_qr
+
+
+SECRET = b'test-secret'
+
+
+class VerifyPassTest(unittest.TestCase):
+
+    def setUp(self):
+        self.token = issue_pass(SECRET, 42, timedelta(hours=1))
+        self.visitor_id, self.expires, self.signature = self.token.split('.')
+
+    def assertRejected(self, token, message='Invalid visitor pass'):
+        with self.assertRaises(ValueError) as context:
+            verify_pass(SECRET, token)
+        self.assertEqual(str(context.exception), message)
+
+    def test_valid_pass(self):
+        visitor_id, expires = verify_pass(SECRET, self.token)
+        self.assertEqual(visitor_id, 42)
+        self.assertEqual(expires, int(self.expires))
+
+    def test_scanner_whitespace_is_ignored(self):
+        self.assertEqual(verify_pass(SECRET, f"  {self.token}\n")[0], 42)
+
+    def test_forged_signature(self):
+        self.assertRejected(f"{self.visitor_id}.{self.expires}.{'A' * len(self.signature)}")
+
+    def test_wrong_secret(self):
+        self.assertRejected(issue_pass(b'other-secret', 42, timedelta(hours=1)))
+
+    def test_tampered_visitor_id(self):
+        self.assertRejected(f"43.{self.expires}.{self.signature}")
+
+    def test_tampered_expiry(self):
+        self.assertRejected(f"{self.visitor_id}.{int(self.expires) + 3600}.{self.signature}")
+
+    def test_expired(self):
+        self.assertRejected(issue_pass(SECRET, 42, timedelta(seconds=-1)),
+                            'Visitor pass has expired')
+
+    def test_malformed(self):
+        for token in (None, '', 'not-a-pass', '42', f"{self.token}.extra",
+                      f"x.{self.expires}.{self.signature}", f"{self.token[:-1]}"):
+            with self.subTest(token=token):
+                self.assertRejected(token)
+
+    def test_non_ascii(self):
+        for token in (f"1.9999999999.{'é' * 22}",
+                      f"{self.visitor_id}.{self.expires}.{self.signature[:-1]}é",
+                      f"٤٢.{self.expires}.{self.signature}"):
+            with self.subTest(token=token):
+                self.assertRejected(token)
+
+
+class RenderPassQrTest(unittest.TestCase):
+
+    def test_render_is_cached(self):
+        token = issue_pass(SECRET, 7, timedelta(hours=1))
+        render_pass_qr.cache_clear()
+        first = render_pass_qr(token)
+        self.assertTrue(first.lstrip().startswith(b'<?xml'))
+        self.assertIs(render_pass_qr(token), first)
+        self.assertEqual(render_pass_qr.cache_info().hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()